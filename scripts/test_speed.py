@@ -16,6 +16,7 @@
     Python3 and python3-pip
     prettytable (https://pypi.org/project/prettytable/)
     pandas (https://pypi.org/project/pandas/)
+    numpy (https://pypi.org/project/numpy/, installed along with pandas)
     If any required modules are not already installed on the system, this python module will automatically install them. 
     If the automatic installation fails, please install the required modules manually. 
 """
@@ -28,6 +29,10 @@
 #
 #   python3 test_speed.py --dataset $PATH_DATASETS_DIR -m lz4 -cw ipp --ipp $IPP_PATCHED_LZ4_LIBS_PATH
 
+##  Usage example for AMD optimized vs Reference for the real-time levels of zstd and zlib:
+#
+#   python3 test_speed.py --dataset $PATH_DATASETS_DIR -m zstd zlib --preset fast -cw vanilla
+
 
 __copyright__ = """
     Copyright (C) 2023, Advanced Micro Devices. All rights reserved.
@@ -64,10 +69,13 @@ import sys
 import os
 import time
 import subprocess
-import math
 import re
+import shlex
 import platform
 import shutil
+import hashlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 ## =========================
 # Install the Python modules 
@@ -78,24 +86,37 @@ def install_required_modules():
         Install the Python modules in the modules list, if they are not already installed.
     """
 
+    from importlib.metadata import distribution, PackageNotFoundError
+
     modules = ['prettytable', 'pandas']
-    pip_lists = subprocess.run(
-        ['python3', '-m', 'pip', 'list'], stdout=subprocess.PIPE, check=True)
     for module in modules:
-        if pip_lists.stdout.decode("utf-8").find(module) <= 0:
+        try:
+            distribution(module)
+        except PackageNotFoundError:
             print("Module {} not found. Installing...".format(module))
-            subprocess.run(["python3", "-m", "pip", "install",
+            subprocess.run([sys.executable, "-m", "pip", "install",
                            "-U", module], check=True)
 try:
-    from prettytable import PrettyTable, from_csv
+    from prettytable import PrettyTable
     import pandas as pd
+    import numpy as np
     
 except ImportError:
     install_required_modules()
+    from prettytable import PrettyTable
+    import pandas as pd
+    import numpy as np
 
 
 DEFAULT_DATASETS = 'http://sun.aei.polsl.pl/~sdeor/corpus/silesia.zip'
 ITERS = 50
+# Compression levels benchmarked for each method with the --preset option, a method passed without a level
+# otherwise runs all of its levels. fast: real-time levels, balanced: mid-range levels, max: highest ratio levels
+PRESETS = {
+    'fast': {'lz4hc': [1, 3], 'lzma': [0, 1], 'zlib': [1, 3], 'zstd': [1, 3, 5], 'bzip2': [1]},
+    'balanced': {'lz4hc': [6, 9], 'lzma': [5], 'zlib': [6], 'zstd': [10, 15], 'bzip2': [5]},
+    'max': {'lz4hc': [12], 'lzma': [9], 'zlib': [9], 'zstd': [19, 22], 'bzip2': [9]},
+}
 pwd = os.path.dirname(os.path.abspath(__file__)) # Get the absolute path of the current python script
 DEFAULT_REPO = os.path.join(pwd, '..')
 DEFAULT_BUILD = os.path.join(DEFAULT_REPO, 'build')
@@ -105,6 +126,27 @@ error = "ERROR: "
 args = None
 which_platform = platform.system()  # Check Platfrom before running
 
+# Regex used to extract the results from the benchmark output log. It is compiled once at load time
+# for each library data prefix and combines all the patterns, so that the log is scanned in a single pass.
+# The benchmark prints all of them at the start of a line, so matches are only attempted at line starts.
+LIBDATA_PREFIX = {
+    'AMD': 'AOCL-COMPRESSION',
+    'IPP': 'IPP',
+    'NAPI': 'COMPRESSION Native API',
+}
+RX_RESULTS = (
+    r'|(?P<comp>Compression: .* speed\(best\) (?P<comp_speed>.*) MB/s,)'
+    r'|(?P<decomp>Decompression: .* speed\(best\) (?P<decomp_speed>.*) MB/s,)'
+    r'|(?P<ratio>Ratio:(?P<ratio_value>.*)\n)')
+RX_LOG = {
+    opt: re.compile(
+        r'^(?:(?P<libdata>' + prefix + r' \[(?P<lib>.*)\] \[Filename:(?P<dataset>.*)\] --)' + RX_RESULTS + ')',
+        re.MULTILINE)
+    for opt, prefix in LIBDATA_PREFIX.items()
+}
+# Bound finditer methods of the regexes, so that no method lookup is done when parsing
+RX_LOG_FINDITER = {opt: rx.finditer for opt, rx in RX_LOG.items()}
+
 def remove_file_folder(path):
     """ Remove output file or dir if needed """
     
@@ -116,6 +158,54 @@ def remove_file_folder(path):
         pass
 
 
+## ===================================================
+# Fingerprint the sources and options of the last build
+## ===================================================
+
+BUILD_SOURCE_EXTS = ('.c', '.h', '.cc', '.cpp', '.S', '.s', '.asm', '.in', '.cmake')
+# Environment variables read by CMake when configuring the build
+BUILD_ENV_VARS = ('CC', 'CXX', 'ASM', 'CFLAGS', 'CXXFLAGS', 'ASMFLAGS', 'LDFLAGS',
+                  'CMAKE_GENERATOR', 'CMAKE_BUILD_TYPE', 'CMAKE_TOOLCHAIN_FILE')
+
+def get_build_fingerprint(repo_path, build_options):
+    """
+    Hash the library sources and CMake files under repo_path together with the build options
+    (commands, optional flags and compiler) and the BUILD_ENV_VARS environment variables,
+    to detect if the last build can be reused.
+    The build, installation and .git directories at the top of repo_path are skipped.
+    """
+    h = hashlib.blake2b()
+    h.update(repr(build_options).encode())
+    h.update(repr([(var, os.environ.get(var)) for var in BUILD_ENV_VARS]).encode())
+    for root, dirs, files in os.walk(repo_path):
+        if root == repo_path:
+            dirs[:] = [d for d in dirs if d not in ('.git', 'build', 'amd-compression')]
+        dirs.sort()
+        for name in sorted(files):
+            if name == 'CMakeLists.txt' or name.endswith(BUILD_SOURCE_EXTS):
+                path = os.path.join(root, name)
+                h.update(os.path.relpath(path, repo_path).encode())
+                with open(path, 'rb') as f:
+                    h.update(f.read())
+    return h.hexdigest()
+
+## ==========================
+# Expand the benchmark presets
+## ==========================
+
+def expand_preset_methods(methods, preset):
+    """
+    Expand each method passed without a level to the levels of the preset, like zstd to zstd:1 zstd:3 zstd:5
+    for the fast preset. Methods passed with a level and methods without levels (lz4, snappy) are kept as is.
+    """
+    expanded = []
+    for method in methods:
+        if ':' not in method and method in PRESETS[preset]:
+            expanded.extend("{}:{}".format(method, level) for level in PRESETS[preset][method])
+        else:
+            expanded.append(method)
+    return expanded
+
 ## =========================
 # Calculate %Gain/Regression
 ## =========================
@@ -126,16 +216,32 @@ def get_percentage_inc_dec(first_num, second_num):
     except ZeroDivisionError:
         return 0
 
-# Get Geometric mean
-def geo_mean(itr):
-    ls = list(itr)
-    # Contain only positive numbers
-    pos_ls = [val for val in ls if val > 0]
-    if len(pos_ls) == 0:
-        return 0
-    else:
-        return math.exp(sum(math.log(n) for n in pos_ls) / len(pos_ls))
+# Calculate %Gain/Regression of each row of two pandas Series at once
+def get_percentage_inc_dec_series(first_series, second_series):
+    diff = first_series.div(second_series).sub(1).mul(100)
+    # Division by zero gives 0 as in get_percentage_inc_dec
+    return diff.mask(second_series == 0, 0)
 
+# Get Geometric mean of all the columns of a DataFrame or 2D array at once
+def geo_mean_columns(df):
+    arr = np.asarray(df, dtype=np.float64)
+    # Contain only positive numbers
+    pos = arr > 0
+    counts = pos.sum(axis=0)
+    log_sums = np.log(arr, out=np.zeros_like(arr), where=pos).sum(axis=0)
+    return np.where(counts > 0, np.exp(log_sums / np.maximum(counts, 1)), 0)
+
+# Print a DataFrame as a table on the console, rendered once with all of its rows
+def print_table(df, float_format='{}'):
+    def format_value(value):
+        # Format the numbers like in the CSV files and leave the missing values empty
+        if isinstance(value, float):
+            return '' if np.isnan(value) else float_format.format(value)
+        return value
+
+    table = PrettyTable(field_names=list(df.columns))
+    table.add_rows([[format_value(value) for value in row] for row in df.values.tolist()])
+    print(table)
 
 # Print log
 def write(msg):
@@ -146,195 +252,167 @@ def write(msg):
 ## ==================================
 
 def download_datasets(url, extract_dir):
+    """ Stream the dataset archive to a temporary file in chunks and extract its members in parallel """
+    import tempfile
     from urllib import request
     from zipfile import ZipFile
-    zip_path, _ = request.urlretrieve(url)
-    with ZipFile(zip_path, "r") as f:
-        f.extractall(extract_dir)
+
+    fd, zip_path = tempfile.mkstemp(suffix='.zip')
+    try:
+        with os.fdopen(fd, 'wb') as zip_file, request.urlopen(url) as response:
+            shutil.copyfileobj(response, zip_file, 1 << 20)
+        with ZipFile(zip_path, "r") as f:
+            members = f.infolist()
+
+        # Create the member directories upfront, so that the workers do not race on creating them
+        for member in members:
+            dirs = [d for d in member.filename.split('/')[:-1] if d not in ('', '.', '..')]
+            if dirs:
+                os.makedirs(os.path.join(extract_dir, *dirs), exist_ok=True)
+
+        # Every member is a separate compressed stream, each worker reads it with its own handle
+        def extract_member(member):
+            with ZipFile(zip_path, "r") as f:
+                f.extract(member, extract_dir)
+
+        with ThreadPoolExecutor() as executor:
+            list(executor.map(extract_member, members))
+    finally:
+        os.remove(zip_path)
 
 ## ================================================================
 # Retrieve the relevant components and move to the processing steps
 ## ================================================================
         
 
-def parse_line(line, amd_opt):
-    """
-    Do a regex search against all defined regexes and
-    return the key and match result of the first matching regex
-
-    """
-    rx_dict = {
-        'libdata': re.compile(r'AOCL-COMPRESSION \[(.*)\] \[Filename:(.*)\] --'),
-        'comp': re.compile(r'Compression: (.*) speed\(best\) (.*) MB/s,'),
-        'decomp': re.compile(r'Decompression: (.*) speed\(best\) (.*) MB/s,'),
-        'ratio': re.compile(r'Ratio:(.*)\n'),
-    }
-    
-    # Check if Error occurred
-    if "Error" in line:
-        print("\n" + line)
-        exit()
-
-    # If IPP option enabled
-    if amd_opt == "IPP":
-        rx_dict['libdata'] = re.compile(r'IPP \[(.*)\] \[Filename:(.*)\] --')
-    
-    # If Native API option enabled
-    if amd_opt == "NAPI":
-        rx_dict['libdata'] = re.compile(r'COMPRESSION Native API \[(.*)\] \[Filename:(.*)\] --')
-
-    for key, rx in rx_dict.items():
-        match = rx.search(line)
-        if match:
-            return key, match
-    # if there are no matches
-    return None, None
-
-
-def proc(cmd_args, pipe=True):
+def proc(cmd_args, pipe=True, log_path='out.log'):
     """
     Args:
         cmd_args: The command argument is passed as the cmd_args parameter.
-        pipe: stdout is redirected to a pipe. Defaults to True.
+        pipe: stdout is streamed to the log file. Defaults to True.
+        log_path: Log file that stdout is appended to. Defaults to 'out.log'.
     """
     if pipe:
-        subproc = subprocess.Popen(
-            cmd_args,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True)
+        # Let the child process write to the log file directly instead of collecting its output here
+        with open(log_path, 'ab') as f:
+            subprocess.run(cmd_args, stdout=f, stderr=subprocess.PIPE, check=False)
     else:
-        subproc = subprocess.Popen(cmd_args)
-
-    outs, errs = subproc.communicate()
-    orig_stdout = sys.stdout
-    f = open('out.log', 'a')
-    sys.stdout = f
-    print(outs)
-    sys.stdout = orig_stdout
-    f.close()
+        subprocess.run(cmd_args, check=False)
 
 ## =================================================
 # Extract the relevant data from the output log file
 ## =================================================
                 
 def parse_file(fileName, amd_opt):
+    """
+    Parse the benchmark output log and return the list of results,
+    one [method, dataset, comp, decomp, ratio] row per dataset
+    """
     # create an empty list to collect the data
-    data = [['method', 'dataset', 'comp', 'decomp', 'ratio'],]
-    # Delete old file 
-    remove_file_folder('parse_out.log')
+    data = []
 
-    # open the file and read through it line by line
+    # read the whole file, it is scanned at once by the combined regex
     with open(fileName, 'r') as file_object:
-        line = file_object.readline()
-        while line:
-            # at each line check for a match with a regex
-            key, match = parse_line(line, amd_opt)
-            if key == 'libdata':
-                lib = match.group(1)
-                dataset = match.group(2)
-            if key == 'comp':
-                comp = match.group(2)
-            if key == 'decomp':
-                decomp = match.group(2)
-            if key == 'ratio':
-                ratio = match.group(1).strip()
-                dd = " ".join([lib, dataset, comp, decomp, ratio])
-                with open("parse_out.log", "a", encoding="utf-8") as f:
-                    f.write(dd + '\n')
-            line = file_object.readline()
+        text = file_object.read()
+
+    # Check if Error occurred and print the line which reported it
+    pos = text.find("Error")
+    if pos >= 0:
+        end = text.find("\n", pos)
+        print("\n" + text[text.rfind("\n", 0, pos) + 1:end + 1 if end >= 0 else len(text)])
+        exit()
+
+    # Pick the library data prefix of the IPP or Native API option if enabled
+    for match in RX_LOG_FINDITER.get(amd_opt, RX_LOG_FINDITER['AMD'])(text):
+        key = match.lastgroup
+        if key == 'libdata':
+            lib = match.group('lib')
+            dataset = match.group('dataset')
+        if key == 'comp':
+            comp = match.group('comp_speed')
+        if key == 'decomp':
+            decomp = match.group('decomp_speed')
+        if key == 'ratio':
+            ratio = match.group('ratio_value').strip()
+            data.append([lib, dataset, comp, decomp, ratio])
     return data
 
 ## ========================
 # To run test bench command 
 ## ========================
 
-def testbench(args, pipe=True):
-    return proc([bench_cmd] + args, pipe)
+def testbench(args, pipe=True, log_path='out.log'):
+    return proc([bench_cmd] + args, pipe, log_path)
 
 
 ## ===================
 # Execute the command 
 ## ===================
 
-def run_command(cmd, filename='build_logs.log', print_command=True, print_output=False, print_error=True, param_shell=True):
+def run_command(cmd, filename='build_logs.log', print_command=True, print_output=False, print_error=True, param_shell=False):
     """
     Parameters:
-        cmd: Pass the command for execution.
+        cmd: Pass the command for execution, either as a list of arguments or as a string.
         filename: Save Console's output to file. Defaults to 'build_logs.log'.
         print_command: Print the command to the console before being executed.
         print_output: Print the command's output to the console.
         print_error: Print error messages to the console.
-        param_shell: cmd string is passed to the system's shell for execution if it is true.
+        param_shell: cmd string is passed to the system's shell for execution if it is true. Defaults to False,
+            the cmd string is then split into arguments with shlex on Linux and executed without a shell.
     Raises:
         RuntimeError: Function raises a RuntimeError if the command's return code is non-zero(means subprocess completed with error).
     Returns: Function returns a list of the lines of output generated with the command.
     """
     if print_command:
-        write(cmd)
-    popen = subprocess.Popen(
+        if isinstance(cmd, str):
+            write(cmd)
+        else:
+            # Print the argument list quoted the way the platform's shell expects it
+            write(subprocess.list2cmdline(cmd) if which_platform == 'Windows' else shlex.join(cmd))
+    if not param_shell and isinstance(cmd, str) and which_platform != 'Windows':
+        cmd = shlex.split(cmd)
+    result = subprocess.run(
         cmd,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
+        text=True,
         shell=param_shell,
-        cwd=run_command.cwd)
-    output, error = popen.communicate()
-    output = output.decode()
-    error = error.decode()
+        cwd=run_command.cwd,
+        check=False)
+    output = result.stdout
+    error = result.stderr
     if print_output:
         if output or (error and print_error):
             with open(filename, 'a') as f:
                 f.write(output + '\n')
                 f.write(error + '\n')
-    if popen.returncode !=0:
+    if result.returncode != 0:
         if error and not print_output and print_error:
             print(error)
-        raise RuntimeError(output + error).splitlines()
+        raise RuntimeError(output + error)
     return (output + error).splitlines()
 
 run_command.cwd = None
 
-def get_results(fileName):
-    """
-    To get relevant information from the processed output file
-    """
-    if not os.path.isfile(fileName):
-        return None, None, None, None, None
-
-    with open(fileName, 'r') as f:
-        (lib, dtype, dsize, dspeed, dratio) = ([], [], [], [], [])
-        words = []
-        for line in f:
-            word = list(line.split(" "))
-            lib.append(word[0])
-            dtype.append(word[1])
-            dsize.append(word[2])
-            dspeed.append(word[3])
-            dratio.append(word[4])
-        words.append(lib)
-        words.append(dtype)
-        words.append(dsize)
-        words.append(dspeed)
-        words.append(dratio)
-        return words
-
 ## =============================
 # Calculate and print highlights 
 ## =============================
 
-def compare_benchmarks_numbers(amd_opt_yes, compare, method_name, amd_opt):
+def compare_benchmarks_numbers(amd_opt_yes, compare, method_name, amd_opt, method_slug):
     """
     parameters:
-        amd_opt_yes (string): Enable AOCL optimization 
-        compare (string):  Comparison lib optimization
+        amd_opt_yes (DataFrame): Results with AOCL optimization enabled
+        compare (DataFrame):  Results of the comparison lib optimization
         method_name (string): Compression method 
+        method_slug (string): Compression method used in the report file names, like zlib_Level_1
     """
-    fnamereport = 'final_comparision_report_{}.csv'.format(method_name.replace(':', '_Level_'))
-    csv1 = pd.read_csv(amd_opt_yes)
-    csv2 = pd.read_csv(compare)
-    merged_data = csv1.merge(csv2, on=["Method", "DataSet"], how="left")
-    merged_data.to_csv(fnamereport, index=False)
-    csv3 = pd.read_csv(fnamereport)
+    fnamereport = 'final_comparision_report_{}.csv'.format(method_slug)
+    merged_data = amd_opt_yes.merge(compare, on=["Method", "DataSet"], how="left")
+    # Add the %Gain/Regression of each dataset to the report
+    for metric in ("ComprSpeed", "DecomprSpeed", "ComprRatio"):
+        merged_data["{} Diff(%)".format(metric)] = get_percentage_inc_dec_series(
+            merged_data["{}_AMD_OPT_ON".format(metric)], merged_data["{}_{}".format(metric, amd_opt)]).round(2)
+    merged_data.to_csv(fnamereport, index=False, float_format='%.2f')
     sumrTable = PrettyTable()
     DsumrTable = PrettyTable()
     RsumrTable = PrettyTable()
@@ -344,12 +422,16 @@ def compare_benchmarks_numbers(amd_opt_yes, compare, method_name, amd_opt):
         "ComprSpeed_AMD_OPT_ON",
         "ComprSpeed_{}".format(amd_opt),
         "ComprSpeed Diff(%)"]
-    comprspeed_y = round(geo_mean(csv3["ComprSpeed_AMD_OPT_ON"]), 2)
-    comprspeed_n = round(geo_mean(csv3["ComprSpeed_{}".format(amd_opt)]), 2)
-    dcomprspeed_y = round(geo_mean(csv3["DecomprSpeed_AMD_OPT_ON"]), 2)
-    dcomprspeed_n = round(geo_mean(csv3["DecomprSpeed_{}".format(amd_opt)]), 2)
-    comprRatio_y = round(geo_mean(csv3["ComprRatio_AMD_OPT_ON"]), 2)
-    comprRatio_n = round(geo_mean(csv3["ComprRatio_{}".format(amd_opt)]), 2)
+    # Get the geometric means of all the metric columns of the merged data in one pass
+    metric_cols = [
+        "ComprSpeed_AMD_OPT_ON",
+        "ComprSpeed_{}".format(amd_opt),
+        "DecomprSpeed_AMD_OPT_ON",
+        "DecomprSpeed_{}".format(amd_opt),
+        "ComprRatio_AMD_OPT_ON",
+        "ComprRatio_{}".format(amd_opt)]
+    (comprspeed_y, comprspeed_n, dcomprspeed_y, dcomprspeed_n, comprRatio_y, comprRatio_n) = [
+        round(float(gm), 2) for gm in geo_mean_columns(merged_data[metric_cols])]
 
     diffS = round(get_percentage_inc_dec(comprspeed_y, comprspeed_n), 2)
     if diffS < 0:
@@ -387,62 +469,57 @@ def compare_benchmarks_numbers(amd_opt_yes, compare, method_name, amd_opt):
     RsumrTable.add_row([method_name, comprRatio_y, comprRatio_n, diffS])
     print(RsumrTable, "\n")
 
-    with open(fnamereport) as fp:
-        ptable = from_csv(fp)
-    print(ptable)
+    print_table(merged_data, '{:.2f}')
 
 ## ===================================
 #  Create a performance summary tables
 ##====================================
         
-def create_tables(fileName, amd_opt, method_name):
-    """ This is a function that take detailed input file and create beautiful tables.
+def create_tables(fileName, amd_opt, method_name, method_slug):
+    """ This is a function that take the benchmark output file and create the results CSV table.
+        The table is only rendered with PrettyTable when it is printed to the console.
+        method_slug is the compression method used in the CSV file name, like zlib_Level_1.
+        Returns the results as a DataFrame.
     """
 
     tableName = amd_opt
-    rescsvFile = 'final_{}_{}.csv'.format(method_name.replace(':', '_Level_'), tableName)
+    rescsvFile = 'final_{}_{}.csv'.format(method_slug, tableName)
     CspeedOPT = "ComprSpeed_{}".format(tableName)
     DspeedOPT = "DecomprSpeed_{}".format(tableName)
     ComprRatio = "ComprRatio_{}".format(tableName)
     print("Compression benchmarking completed for the method {} with {}".format(
         method_name, tableName.replace("IPP", "IPP_OPT_ON")))
-    tableName = PrettyTable()
-    tableName.field_names = [
+    fieldNames = [
         "Method",
         "DataSet",
         CspeedOPT,
         DspeedOPT,
         ComprRatio]
 
-     # Parse the output file
-    if os.path.exists('out.log') and os.path.getsize('out.log') == 0:
+    # Parse the output file
+    rows = []
+    if os.path.exists(fileName) and os.path.getsize(fileName) == 0:
         print(error + "The benchmark output file is empty. The tests might have failed")
     else:
-        parse_file('out.log', amd_opt)
-    mName = get_results(fileName)[0]
-    csize = get_results(fileName)[1]
-    cspeed = get_results(fileName)[2]
-    dspeed = get_results(fileName)[3]
-    cratio = get_results(fileName)[4]  
-
-    for m, cs, csp, dsp, cr in zip(mName, csize, cspeed, dspeed, cratio):
-        tableName.add_row([m, cs, csp, dsp, cr.strip()])
-    cspeed = [eval(csp) for csp in cspeed]
-    dspeed = [eval(dsp) for dsp in dspeed]
-    cratio = [eval(cr) for cr in cratio]
-    tableName.add_row(["Method:", "Average", round(
-        geo_mean(cspeed), 2), round(geo_mean(dspeed), 2), round(geo_mean(cratio), 2)])
+        rows = parse_file(fileName, amd_opt)
+        if not rows:
+            print(error + "The output file is empty. The tests might have failed")
+
+    # Convert the speed and ratio strings of all the rows to numbers at once
+    results = pd.DataFrame(rows, columns=fieldNames).astype(dict.fromkeys(fieldNames[2:], np.float64))
+    results.loc[len(results)] = ["Method:", "Average"] + [
+        round(float(gm), 2) for gm in geo_mean_columns(results[fieldNames[2:]])]
     print("\n")
 
-    with open(rescsvFile, 'w', newline='') as f:
-        f.write(tableName.get_csv_string())
+    results.to_csv(rescsvFile, index=False, float_format='%.2f')
+    return results
 
 ## =============================================
 #   Sets the user options and trigger benchmarks
 ## =============================================
 
 def run_benchmark_test(datasetFile_lst, method_name, iters, amd_opt="on", comparewith="off", ipp='off', run=True):
-    """Sets the user options and trigger benchmark routine """
+    """Sets the user options and trigger benchmark routine on the list of dataset file paths """
 
     if amd_opt == "on" or amd_opt == "ON":
         amd_opt = 'AMD_OPT_ON'
@@ -454,7 +531,11 @@ def run_benchmark_test(datasetFile_lst, method_name, iters, amd_opt="on", compar
         amd_opt = 'NAPI'
 
     method = "-e{}".format(method_name)
+    # Compression method used in the report file names
+    method_slug = method_name.replace(':', '_Level_')
     testOptions = []
+    # Results DataFrame of each optimization option, passed over to the comparison
+    results = {}
     compare = comparewith
     iters = "-i{}".format(iters)
 
@@ -463,6 +544,7 @@ def run_benchmark_test(datasetFile_lst, method_name, iters, amd_opt="on", compar
         print("\nCompression benchmarking started for the method {} with {} .....".format(
             method_name, amd_opt.replace("IPP", "IPP_OPT_ON")))
         remove_file_folder("out.log")
+        datasetOptions = []
         for dataset in datasetFile_lst:
             testOptions = ["-t", "-p"]
             if amd_opt == "IPP" or amd_opt == "ipp":
@@ -471,15 +553,32 @@ def run_benchmark_test(datasetFile_lst, method_name, iters, amd_opt="on", compar
                 testOptions.append("-o")
             if amd_opt == "NAPI" or amd_opt == "napi":
                 testOptions.append("-n")
-            cmd = "{}/{}".format(args.dataset, dataset)
-            testOptions.append(cmd)
+            testOptions.append(dataset)
             testOptions.append(method)
             testOptions.append(iters)
-            testbench(testOptions, True)
-        if os.path.exists('parse_out.log') and os.path.getsize('parse_out.log') == 0:
-            print(error + "The output file is empty. The tests might have failed")
+            datasetOptions.append(testOptions)
+
+        if args.jobs > 1 and len(datasetOptions) > 1:
+            # Run the datasets in parallel, each benchmark writes to its own log file
+            # and the log files are concatenated to out.log in the dataset order
+            logFiles = ["out_{}.log".format(i) for i in range(len(datasetOptions))]
+            # Drop the logs left over by an interrupted run, proc appends to them
+            for logFile in logFiles:
+                remove_file_folder(logFile)
+            try:
+                with ThreadPoolExecutor(max_workers=min(args.jobs, len(datasetOptions))) as executor:
+                    list(executor.map(lambda opts, log: testbench(opts, True, log), datasetOptions, logFiles))
+                with open('out.log', 'ab') as out:
+                    for logFile in logFiles:
+                        with open(logFile, 'rb') as f:
+                            shutil.copyfileobj(f, out)
+            finally:
+                for logFile in logFiles:
+                    remove_file_folder(logFile)
         else:
-            create_tables('parse_out.log', amd_opt, method_name)
+            for testOptions in datasetOptions:
+                testbench(testOptions, True)
+        results[amd_opt] = create_tables('out.log', amd_opt, method_name, method_slug)
 
         if comparewith == "ipp":
             if ipp != 'off':
@@ -496,14 +595,9 @@ def run_benchmark_test(datasetFile_lst, method_name, iters, amd_opt="on", compar
         comparewith = "off"
 
     if compare in ('ipp', 'vanilla', 'napi'):
-        compare_benchmarks_numbers('final_{}_AMD_OPT_ON.csv'.format(
-            method_name.replace(':', '_Level_')), 'final_{}_{}.csv'.format(method_name.replace(':', '_Level_'), amd_opt), 
-            method_name, amd_opt)
+        compare_benchmarks_numbers(results['AMD_OPT_ON'], results[amd_opt], method_name, amd_opt, method_slug)
     else:
-        with open('final_{}_{}.csv'.format(method_name.replace(':', '_Level_'), amd_opt)) as fp:
-            detailsTable = from_csv(fp)
-
-        print(detailsTable)
+        print_table(results[amd_opt], '{:.2f}')
 
             
 ## ===============
@@ -517,7 +611,7 @@ if __name__ == '__main__':
         required=True, help='Input dataset files path for speed benchmarks. If no dataset available in the path, the standard Silesia dataset will be downloaded automatically.')
     parser.add_argument(
         '--build', '-b', choices=['yes', 'no'],
-        help='Use this option to control build and install AOCL-Compression before benchmark tests. yes: Build and install from the source package, no: Do not build and install, but reuse the last installed binaries. Default behavior: Yes(always build and install)', default="yes")
+        help='Use this option to control build and install AOCL-Compression before benchmark tests. yes: Build and install from the source package, unless the sources, build options and compiler environment variables (CC, CXX, CFLAGS, ...) are unchanged since the last build (remove the build directory to force a rebuild), no: Do not build and install, but reuse the last installed binaries. Default behavior: Yes(build and install if anything changed)', default="yes")
     parser.add_argument(
         '--collectBuildlogs', '-printlogs', choices=['yes', 'no'],
         help='Pass -printlogs yes to collect build logs to the file build_logs.log. By default, build logs are not collected.', default="no")
@@ -528,6 +622,11 @@ if __name__ == '__main__':
         '--method', '-m',
         required=True, help='Pass a list of compression methods to run speed benchmark. Pass it like <method name>:<level>. For example: For zlib level 1, pass zlib:1 '
         'Supported methods and levels: lz4 - No levels, lz4hc - levels[1-12], snappy - No levels, lzma - levels[0-9], zlib - levels[1-9], zstd - levels[1-22], bzip2 - levels[1-9]', nargs="*")
+    parser.add_argument(
+        '--preset', '-preset', choices=list(PRESETS),
+        help='Benchmark only the representative levels of the methods passed without a level, instead of all their levels. '
+        'fast: real-time levels(for example zstd:1 zstd:3 zstd:5), balanced: mid-range levels(for example zstd:10 zstd:15), max: highest ratio levels(for example zstd:19 zstd:22). '
+        'For example: -m zstd zlib lz4 --preset fast')
     parser.add_argument(
         '--ipp', '-ipp',
         help='Provide IPP installed library path like for lz4: --ipp $PATH/lz4-1.9.3/lib) and for zlib: --ipp $PATH/zlib-1.2.11)', default=ipp)
@@ -542,6 +641,10 @@ if __name__ == '__main__':
     parser.add_argument(
         '--iterations', '-itr',
         help='Specify number of iterations for compression/decompression.', default=ITERS)
+    parser.add_argument(
+        '--jobs', '-j', type=int,
+        help='Specify number of dataset files to benchmark in parallel. Parallel runs share the CPU cores, caches and memory bandwidth, '
+        'which can affect the measured speeds. Pass 0 to use half of the available CPUs. Default is 1(run the dataset files one after another)', default=1)
     parser.add_argument('--optionalFlags', '-flags',
                         help='Pass a list of supported optional flags (SNAPPY_MATCH_SKIP_OPT, AOCL_LZ4_OPT_PREFETCH_BACKWARDS, AOCL_ZSTD_SEARCH_SKIP_OPT_DFAST_FAST, AOCL_ZSTD_WILDCOPY_LONG and LZ4_FRAME_FORMAT_SUPPORT) as required. For example: -flags SNAPPY_MATCH_SKIP_OPT=ON AOCL_LZ4_OPT_PREFETCH_BACKWARDS=ON AOCL_ZSTD_SEARCH_SKIP_OPT_DFAST_FAST=ON AOCL_ZSTD_WILDCOPY_LONG=ON LZ4_FRAME_FORMAT_SUPPORT=ON',
                         type=str, nargs="*", default=[])
@@ -549,6 +652,15 @@ if __name__ == '__main__':
                         type=str, help='This is a Windows platform specific option. Use this option to provide an installed Visual Studio version available on the system. Default is "Visual Studio 17 2022"', default="Visual Studio 17 2022")
     args = parser.parse_args()
 
+    if args.preset:
+        args.method = expand_preset_methods(args.method, args.preset)
+
+    # Use half of the available CPUs, as the benchmarks are CPU bound, if the number of jobs is 0
+    if args.jobs < 0:
+        parser.error("argument --jobs/-j: must be 0(half of the available CPUs) or a positive number, got {}".format(args.jobs))
+    if args.jobs == 0:
+        args.jobs = max(1, (os.cpu_count() or 2) // 2)
+
     run_command.cwd = DEFAULT_REPO
     ## ==============================
     # Installing Compression library
@@ -563,13 +675,14 @@ if __name__ == '__main__':
             installation_path, 'aocl_compression/bin/aocl_compression_bench')
         
     # Linux specific library configuration and installation commands with default flags
+    # The commands are argument lists, so that they are executed without a shell
     compression_cmds = {
-        'config_cmd': 'cmake -B build . -DCMAKE_BUILD_TYPE=Release -DAOCL_LZ4_NEW_PRIME_NUMBER=ON -DSNAPPY_MATCH_SKIP_OPT=ON -DAOCL_ZSTD_SEARCH_SKIP_OPT_DFAST_FAST=ON -DCMAKE_INSTALL_PREFIX={}'.format(installation_path),
-        'install_cmd': 'cmake --build build -v -j --target uninstall --target install'}
+        'config_cmd': ['cmake', '-B', 'build', '.', '-DCMAKE_BUILD_TYPE=Release', '-DAOCL_LZ4_NEW_PRIME_NUMBER=ON', '-DSNAPPY_MATCH_SKIP_OPT=ON', '-DAOCL_ZSTD_SEARCH_SKIP_OPT_DFAST_FAST=ON', '-DCMAKE_INSTALL_PREFIX={}'.format(installation_path)],
+        'install_cmd': ['cmake', '--build', 'build', '-v', '-j', '--target', 'uninstall', '--target', 'install']}
     # Windows specific library configuration and installation commands with default flags
     compression_cmds_windows = {
-        'config_cmd': 'cmake -B build . -T ClangCl -G "{}" -DAOCL_LZ4_NEW_PRIME_NUMBER=ON -DSNAPPY_MATCH_SKIP_OPT=ON -DAOCL_ZSTD_SEARCH_SKIP_OPT_DFAST_FAST=ON -DCMAKE_INSTALL_PREFIX={}'.format(args.VSVersion, installation_path),
-        'install_cmd': 'cmake --build ./build --config Release --target INSTALL'
+        'config_cmd': ['cmake', '-B', 'build', '.', '-T', 'ClangCl', '-G', args.VSVersion, '-DAOCL_LZ4_NEW_PRIME_NUMBER=ON', '-DSNAPPY_MATCH_SKIP_OPT=ON', '-DAOCL_ZSTD_SEARCH_SKIP_OPT_DFAST_FAST=ON', '-DCMAKE_INSTALL_PREFIX={}'.format(installation_path)],
+        'install_cmd': ['cmake', '--build', './build', '--config', 'Release', '--target', 'INSTALL']
     }
                 
     def install_compression(cmds, optionalFlags):
@@ -579,16 +692,14 @@ if __name__ == '__main__':
         """
         # Add all the optional flags if specified by the user
         for flag in optionalFlags:
-            # Handle the duplication of the configuration flags 
-            if flag not in cmds["config_cmd"]:
-                if flag.split("=")[0] in cmds["config_cmd"]: 
-                    flag_input = 'ON'
-                    if flag.split("=")[1] == 'ON':
-                        flag_input = 'OFF'
-                    # Replace the configuration flags based on user input
-                    cmds["config_cmd"] = cmds["config_cmd"].replace(flag.split("=")[0] + '=' + flag_input, flag)
-                else:
-                    cmds["config_cmd"] = cmds["config_cmd"] + " " + "-D{}".format(flag)   
+            # Handle the duplication of the configuration flags, replace the configuration flags based on user input
+            flag_name = "-D{}=".format(flag.split("=")[0])
+            for i, config_flag in enumerate(cmds["config_cmd"]):
+                if config_flag.startswith(flag_name):
+                    cmds["config_cmd"][i] = "-D{}".format(flag)
+                    break
+            else:
+                cmds["config_cmd"].append("-D{}".format(flag))
 
         print("\nConfiguring AOCL-Compression for the installation .....\n")
         for k, val in cmds.items():
@@ -612,7 +723,7 @@ if __name__ == '__main__':
                 c_compiler = args.compiler
                 
                 if k == 'config_cmd':
-                    val = val + " " + "-DCMAKE_C_COMPILER={}".format(c_compiler) + " " + "-DCMAKE_CXX_COMPILER={}".format(cxx_compiler)
+                    val = val + ["-DCMAKE_C_COMPILER={}".format(c_compiler), "-DCMAKE_CXX_COMPILER={}".format(cxx_compiler)]
                 else:
                     # If installation command running, Print the compiler name with library installing
                     print(
@@ -640,8 +751,9 @@ if __name__ == '__main__':
         print("Input dataset is not available at specified path: {}. So, downloading Silesia dataset to the path \n".format(args.dataset))
         download_datasets(DEFAULT_DATASETS, args.dataset)
 
-    # Make list of the datasets that are available in the directory 
-    datasetFile_lst = sorted(os.listdir("{}".format(args.dataset)))
+    # Make list of the paths of the dataset files that are available in the directory 
+    with os.scandir(args.dataset) as entries:
+        datasetFile_lst = sorted(entry.path for entry in entries if entry.is_file())
     ipp_supports_methods = ['lz4', 'lz4hc', 'zlib', "bzip2"]
 
     # Checks IPP supports before running IPP patched method
@@ -672,20 +784,33 @@ if __name__ == '__main__':
     ## ===========================
 
     if args.build.lower() == "yes":
-        remove_file_folder("build_logs.log")
-        if os.path.isdir(build_path):
-            remove_file_folder(build_path)
-        if which_platform == 'Windows':
-            print("Building for Windows")
-            install_compression(compression_cmds_windows, args.optionalFlags)
+        cmds = compression_cmds_windows if which_platform == 'Windows' else compression_cmds
+        # Skip the build if the last one used the same sources and options and its binaries are still installed
+        fingerprint = get_build_fingerprint(DEFAULT_REPO, (cmds, args.optionalFlags, args.compiler))
+        fingerprint_file = os.path.join(build_path, '.srchash')
+        last_fingerprint = None
+        if os.path.isfile(fingerprint_file):
+            with open(fingerprint_file) as f:
+                last_fingerprint = f.read().strip()
+        if last_fingerprint == fingerprint and (os.path.isfile(bench_cmd) or os.path.isfile(bench_cmd + '.exe')):
+            print("\nAOCL-Compression sources and build options are unchanged since the last build. Skipping the build and install.")
         else:
-            install_compression(compression_cmds, args.optionalFlags)
+            remove_file_folder("build_logs.log")
+            if os.path.isdir(build_path):
+                remove_file_folder(build_path)
+            if which_platform == 'Windows':
+                print("Building for Windows")
+            install_compression(cmds, args.optionalFlags)
+            with open(fingerprint_file, 'w') as f:
+                f.write(fingerprint)
 
     print("\n")
 
     # Delete previous reports if any
-    [remove_file_folder(f) for f in os.listdir(
-        pwd) if os.path.splitext(f)[1] == '.csv']
+    for csvFile in Path(pwd).glob('*.csv'):
+        # Only remove files and links, never a directory matching the pattern
+        if csvFile.is_file() or csvFile.is_symlink():
+            csvFile.unlink(missing_ok=True)
     
     # Check list of methods passed in the arguments and run benchmarks for each of them
     for m in args.method: